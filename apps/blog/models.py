@@ -1,6 +1,10 @@
 import uuid
 
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 from django.db import models
+from django.db.models import ExpressionWrapper, F, Value
+from django.db.models.functions import Coalesce, NullIf
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 from django.utils import timezone
@@ -21,6 +25,24 @@ def category_thumbnail_directory(instance, filename):
     return "thumbnails/blog_categories/{0}/{1}".format(sanitized_name, filename)
 
 
+def click_through_rate_expression(clicks=None, impressions=None):
+    """
+    Expresion SQL del CTR (clicks / impressions * 100), para recalcularlo
+    dentro del mismo UPDATE que modifica los contadores. Acepta los nuevos
+    valores como expresiones F(); NULLIF evita la division por cero.
+    """
+    clicks = F("clicks") if clicks is None else clicks
+    impressions = F("impressions") if impressions is None else impressions
+    return Coalesce(
+        ExpressionWrapper(
+            clicks * 100.0 / NullIf(impressions, 0),
+            output_field=models.FloatField(),
+        ),
+        Value(0.0),
+        output_field=models.FloatField(),
+    )
+
+
 class Category(models.Model):
 
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -71,27 +93,24 @@ class CategoryAnalytics(models.Model):
     click_through_rate = models.FloatField(default=0)
     avg_time_on_page = models.FloatField(default=0)
 
-    def _update_click_through_rate(self):
-        if self.impressions > 0:
-            self.click_through_rate = (self.clicks/self.impressions) * 100
-        else:
-            self.click_through_rate = 0
-        self.save()
-
     def increment_click(self):
-        self.clicks += 1
-        self.save()
-        self._update_click_through_rate()
-    
+        CategoryAnalytics.objects.filter(pk=self.pk).update(
+            clicks=F("clicks") + 1,
+            click_through_rate=click_through_rate_expression(clicks=F("clicks") + 1),
+        )
+        self.refresh_from_db(fields=["clicks", "click_through_rate"])
+
     def increment_impression(self):
-        self.impressions += 1
-        self.save()
-        self._update_click_through_rate()
+        CategoryAnalytics.objects.filter(pk=self.pk).update(
+            impressions=F("impressions") + 1,
+            click_through_rate=click_through_rate_expression(impressions=F("impressions") + 1),
+        )
+        self.refresh_from_db(fields=["impressions", "click_through_rate"])
 
     def increment_view(self, ip_address):
         if not CategoryView.objects.filter(category=self.category, ip_address=ip_address).exists():
             CategoryView.objects.create(category=self.category, ip_address=ip_address)
-            
+
             self.views += 1
             self.save()
 
@@ -130,11 +149,21 @@ class Post(models.Model):
 
     status = models.CharField(max_length=10, choices=status_options, default='draft')
 
+    # Vector de busqueda mantenido via señal post_save (ver update_post_search_vector)
+    search_vector = SearchVectorField(null=True, editable=False)
+
     objects = models.Manager() # default manager
     postobjects = PostObjects() # custom manager
 
     class Meta:
         ordering = ("status", "-created_at")
+        indexes = [
+            GinIndex(fields=["search_vector"], name="post_search_vector_idx"),
+            # Soporta la paginacion por keyset (seek) del listado
+            models.Index(fields=["-created_at", "-id"], name="post_created_id_idx"),
+            # Indice cubriente para las busquedas por slug que solo usan el id
+            models.Index(fields=["slug"], include=["id"], name="post_slug_idx"),
+        ]
 
     def __str__(self):
         return self.title
@@ -169,28 +198,24 @@ class PostAnalytics(models.Model):
     click_through_rate = models.FloatField(default=0)
     avg_time_on_page = models.FloatField(default=0)
 
-    def _update_click_through_rate(self):
-        if self.impressions > 0:
-            self.click_through_rate = (self.clicks/self.impressions) * 100
-        else:
-            self.click_through_rate = 0
-        self.save()
-
     def increment_click(self):
-        self.clicks += 1
-        self.save()
-        self._update_click_through_rate()
-    
+        PostAnalytics.objects.filter(pk=self.pk).update(
+            clicks=F("clicks") + 1,
+            click_through_rate=click_through_rate_expression(clicks=F("clicks") + 1),
+        )
+        self.refresh_from_db(fields=["clicks", "click_through_rate"])
 
     def increment_impression(self):
-        self.impressions += 1
-        self.save()
-        self._update_click_through_rate()
+        PostAnalytics.objects.filter(pk=self.pk).update(
+            impressions=F("impressions") + 1,
+            click_through_rate=click_through_rate_expression(impressions=F("impressions") + 1),
+        )
+        self.refresh_from_db(fields=["impressions", "click_through_rate"])
 
     def increment_view(self, ip_address):
         if not PostView.objects.filter(post=self.post, ip_address=ip_address).exists():
             PostView.objects.create(post=self.post, ip_address=ip_address)
-            
+
             self.views += 1
             self.save()
 
@@ -229,6 +254,13 @@ def create_post_analytics(sender, instance, created, **kwargs):
     if created:
         PostAnalytics.objects.create(post=instance)
 
+@receiver(post_save, sender=Post)
+def update_post_search_vector(sender, instance, **kwargs):
+    # update() no vuelve a disparar la señal
+    Post.objects.filter(pk=instance.pk).update(
+        search_vector=SearchVector("title", "description", "content", "keywords", config="english")
+    )
+
 @receiver(post_save, sender=Category)
 def create_category_analytics(sender, instance, created, **kwargs):
     if created:
@@ -1,7 +1,7 @@
 from rest_framework import serializers
 
 from .models import Post, Category, Heading, PostView
-from apps.media.serializers import MediaSerializer
+from apps.media.serializers import MediaSerializer, serialize_media
 
 class CategorySerializer(serializers.ModelSerializer):
     class Meta:
@@ -69,8 +69,39 @@ class PostListSerializer(serializers.ModelSerializer):
         ]
 
     def get_view_count(self, obj):
+        # Usar el prefetch (to_attr="analytics_cache") cuando este disponible
+        analytics = getattr(obj, "analytics_cache", None)
+        if analytics is not None:
+            return analytics.views
         return obj.post_analytics.views if obj.post_analytics else 0
 
 
-
-
+def serialize_category_list(category):
+    """
+    Version en dict plano de CategoryListSerializer para los endpoints de
+    listado calientes (evita el bind de campos de DRF por instancia).
+    """
+    return {
+        "name": category.name,
+        "slug": category.slug,
+        "thumbnail": serialize_media(category.thumbnail),
+    }
+
+
+def serialize_post_list(post):
+    """
+    Version en dict plano de PostListSerializer para los endpoints de
+    listado calientes (evita el bind de campos de DRF por instancia).
+    """
+    analytics = getattr(post, "analytics_cache", None)
+    if analytics is None:
+        analytics = post.post_analytics
+    return {
+        "id": str(post.id),
+        "title": post.title,
+        "description": post.description,
+        "thumbnail": serialize_media(post.thumbnail),
+        "slug": post.slug,
+        "category": serialize_category_list(post.category),
+        "view_count": analytics.views if analytics else 0,
+    }
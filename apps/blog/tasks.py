@@ -1,115 +1,171 @@
 from celery import shared_task
 
+import ipaddress
 import logging
 
 import redis
 from django.conf import settings
+from django.db import transaction, IntegrityError
+from django.db.models import F
 
-from .models import PostAnalytics, Post, CategoryAnalytics, Category
+from .models import (
+    PostAnalytics,
+    Post,
+    CategoryAnalytics,
+    PostView,
+    click_through_rate_expression,
+)
 
 logger = logging.getLogger(__name__)
 
 redis_client = redis.StrictRedis(host=settings.REDIS_HOST, port=6379, db=0)
 
+def _increment_impressions(analytics_model, field, obj_id, n=1):
+    """
+    Incrementa las impresiones (y recalcula el CTR) con un solo UPDATE atomico.
+    """
+    updated = analytics_model.objects.filter(**{f"{field}_id": obj_id}).update(
+        impressions=F("impressions") + n,
+        click_through_rate=click_through_rate_expression(impressions=F("impressions") + n),
+    )
+    if not updated:
+        try:
+            with transaction.atomic():
+                analytics_model.objects.get_or_create(
+                    **{f"{field}_id": obj_id}, defaults={"impressions": n}
+                )
+        except IntegrityError:
+            logger.info(f"{field.capitalize()} with ID {obj_id} does not exist. Skipping.")
+
+
 @shared_task
 def increment_post_impressions(post_id):
     """
     Incrementa las impresiones del post asociado
     """
     try:
-        analytics, created = PostAnalytics.objects.get_or_create(post__id=post_id)
-        analytics.increment_impression()
+        _increment_impressions(PostAnalytics, "post", post_id)
     except Exception as e:
         logger.info(f"Error incrementing impressions for Post ID {post_id}: {str(e)}")
 
 
-@shared_task
-def increment_post_views_task(slug, ip_address):
+def buffer_post_view(slug, ip_address):
     """
-    Incrementa las vistas de un post.
+    Registra una vista en redis (O(1), sin encolar una tarea por peticion);
+    drain_pending_views las sincroniza periodicamente.
     """
     try:
-        post = Post.objects.get(slug=slug)
-        post_analytics, _ = PostAnalytics.objects.get_or_create(post=post)
-        post_analytics.increment_view(ip_address)
-    except Exception as e:
-        logger.info(f"Error incrementing views for Post slug {slug}: {str(e)}")
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.hincrby("post:views:pending", slug, 1)
+        pipe.sadd(f"post:views:ips:{slug}", ip_address)
+        pipe.execute()
+    except redis.RedisError as e:
+        logger.info(f"Error buffering view for Post slug {slug}: {str(e)}")
 
 
 @shared_task
-def sync_impressions_to_db():
+def drain_pending_views():
     """
-    Sincronizar las impresiones almacenadas en redis con la base de datos
+    Drena las vistas pendientes de redis y las aplica con un UPDATE por post.
     """
-    keys = redis_client.keys("post:impressions:*")
-    for key in keys:
-        try:
-            post_id = key.decode("utf-8").split(":")[-1]
+    pipe = redis_client.pipeline()
+    pipe.hgetall("post:views:pending")
+    pipe.delete("post:views:pending")
+    pending, _ = pipe.execute()
 
-            # Validar que el post existe
+    for raw_slug in pending:
+        slug = raw_slug.decode("utf-8")
+        ips_key = f"post:views:ips:{slug}"
+
+        try:
             try:
-                post = Post.objects.get(id=post_id)
+                post = Post.objects.only("id").get(slug=slug)
             except Post.DoesNotExist:
-                logger.info(f"Post with ID {post_id} does not exist. Skipping.")
+                redis_client.delete(ips_key)
+                logger.info(f"Post with slug {slug} does not exist. Skipping.")
                 continue
 
-            # Obtener impresiones de redis
-            impressions = int(redis_client.get(key))
-            if impressions == 0:
-                redis_client.delete(key)
-                continue
-            
-            # Obtener y crear instancia de category analytics
-            analytics, created = PostAnalytics.objects.get_or_create(post=post)
+            pipe = redis_client.pipeline()
+            pipe.smembers(ips_key)
+            pipe.delete(ips_key)
+            ips, _ = pipe.execute()
+
+            # Deduplicar por IP contra el historial de PostView
+            new_views = 0
+            for raw_ip in ips:
+                ip = raw_ip.decode("utf-8")
+                # El X-Forwarded-For lo controla el cliente: descartar lo que
+                # no sea una IP valida antes de insertarlo en la columna inet
+                try:
+                    ipaddress.ip_address(ip)
+                except ValueError:
+                    logger.info(f"Skipping invalid IP {ip} for Post slug {slug}.")
+                    continue
+                _, created = PostView.objects.get_or_create(post=post, ip_address=ip)
+                if created:
+                    new_views += 1
+
+            if new_views:
+                updated = PostAnalytics.objects.filter(post=post).update(views=F("views") + new_views)
+                if not updated:
+                    PostAnalytics.objects.get_or_create(post=post, defaults={"views": new_views})
+        except Exception as e:
+            # Un slug con problemas no debe abortar el resto del drenado
+            print(f"Error draining views for {slug}: {str(e)}")
 
-            # Incrementar impresiones
-            analytics.impressions += impressions
-            analytics.save()
 
-            # Incrementar la tasa de clics (CTR)
-            analytics._update_click_through_rate()
+def _sync_impressions_to_db(pattern, analytics_model, field):
+    """
+    Drena los buckets de impresiones (un hash por dia, campo = id) y los
+    sincroniza con la base de datos.
+    """
+    for bucket in list(redis_client.scan_iter(match=pattern, count=100)):
+        try:
+            # Saltar claves legacy tipo string que matchean el patron: HGETALL
+            # fallaria con WRONGTYPE despues de que el MULTI ya borro la clave
+            if redis_client.type(bucket) != b"hash":
+                logger.info(f"Skipping non-hash impressions key {bucket}.")
+                continue
 
-            # Eliminar la clave de redis despues de sincronizar
-            redis_client.delete(key)
+            # HGETALL + DEL en un pipeline transaccional (MULTI/EXEC) para no
+            # perder los HINCRBY concurrentes entre la lectura y el borrado
+            pipe = redis_client.pipeline()
+            pipe.hgetall(bucket)
+            pipe.delete(bucket)
+            data, _ = pipe.execute()
+
+            impressions_by_id = {}
+            for obj_id, value in data.items():
+                impressions = int(value)
+                if impressions > 0:
+                    impressions_by_id[obj_id.decode("utf-8")] = impressions
+
+            if impressions_by_id:
+                with transaction.atomic():
+                    for obj_id, impressions in impressions_by_id.items():
+                        _increment_impressions(analytics_model, field, obj_id, impressions)
         except Exception as e:
-            print(f"Error syncing impressions for {key}: {str(e)}")
+            # Un bucket con problemas no debe abortar el resto del drenado
+            print(f"Error syncing impressions for {bucket}: {str(e)}")
 
 
 @shared_task
-def sync_category_impressions_to_db():
+def sync_impressions_to_db():
     """
     Sincronizar las impresiones almacenadas en redis con la base de datos
     """
-    keys = redis_client.keys("category:impressions:*")
-    for key in keys:
-        try:
-            # Decodificar y extraer el ID de la categoría desde la clave Redis
-            category_id = key.decode("utf-8").split(":")[-1]
-
-            # Validar que la categoria existe
-            try:
-                category = Category.objects.get(id=category_id)
-            except Category.DoesNotExist:
-                logger.info(f"Category with ID {category_id} does not exist. Skipping.")
-                continue
-            
-            # Obtener impresiones de redis
-            impressions = int(redis_client.get(key))
-            if impressions == 0:
-                redis_client.delete(key)
-                continue
-
-            # Obtener y crear instancia de category analytics
-            analytics, created = CategoryAnalytics.objects.get_or_create(category=category)
-
-            # Incrementar impresiones
-            analytics.impressions += impressions
-            analytics.save()
+    try:
+        _sync_impressions_to_db("post:impressions:*", PostAnalytics, "post")
+    except Exception as e:
+        print(f"Error syncing post impressions: {str(e)}")
 
-            # Actualizar tasa de clics (CTR)
-            analytics._update_click_through_rate()
 
-            # Eliminar la clave de redis despues de sincronizar
-            redis_client.delete(key)
-        except Exception as e:
-            print(f"Error syncing impressions for {key}: {str(e)}")
\ No newline at end of file
+@shared_task
+def sync_category_impressions_to_db():
+    """
+    Sincronizar las impresiones almacenadas en redis con la base de datos
+    """
+    try:
+        _sync_impressions_to_db("category:impressions:*", CategoryAnalytics, "category")
+    except Exception as e:
+        print(f"Error syncing category impressions: {str(e)}")
\ No newline at end of file
@@ -9,6 +9,7 @@ from rest_framework import status
 
 
 from .models import Category, Post, PostAnalytics, Heading
+from .utils import local_cache_clear
 
 ### MODELS TESTS
 
@@ -101,6 +102,7 @@ class PostListViewTest(TestCase):
     def setUp(self):
         self.client = APIClient()
         cache.clear()  # Limpia el caché antes de cada prueba
+        local_cache_clear()  # Limpia tambien el cache L1 del proceso
 
         self.category = Category.objects.create(name="API", slug="api")
         self.api_key = settings.VALID_API_KEYS[0]
@@ -114,8 +116,9 @@ class PostListViewTest(TestCase):
         )
 
     def tearDown(self):
-        cache.clear() 
-    
+        cache.clear()
+        local_cache_clear()
+
     def test_get_post_list(self):
         url = reverse('post-list')
         response = self.client.get(
@@ -151,6 +154,106 @@ class PostListViewTest(TestCase):
         self.assertIsNone(data['next'])
         self.assertIsNone(data['previous'])
 
+    def test_get_post_list_query_count(self):
+        """
+        Test para verificar que la lista ejecuta un numero constante de
+        consultas sin importar cuantos posts hay (sin N+1).
+        """
+        for i in range(5):
+            Post.objects.create(
+                title=f"API Post {i}",
+                description="API post description",
+                content="API content",
+                slug=f"api-post-{i}",
+                category=self.category,
+                status="published"
+            )
+
+        url = reverse('post-list')
+
+        # Consulta principal + 2 prefetch (post y category analytics)
+        with self.assertNumQueries(3):
+            response = self.client.get(
+                url,
+                HTTP_API_KEY=self.api_key
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['count'], 6)
+
+    def test_get_post_list_empty_filter(self):
+        """
+        Test para verificar que un filtro sin coincidencias devuelve una
+        pagina vacia y no un error.
+        """
+        url = reverse('post-list') + "?category=non-existent-category"
+
+        response = self.client.get(url, HTTP_API_KEY=self.api_key)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+        self.assertTrue(data['success'])
+        self.assertEqual(data['count'], 0)
+        self.assertEqual(data['results'], [])
+
+    def test_get_post_list_keyset_pagination(self):
+        """
+        Test de la paginacion por keyset con el parametro `after`.
+        """
+        from .views import _encode_cursor
+
+        for i in range(3):
+            Post.objects.create(
+                title=f"Seek Post {i}",
+                description="Seek post description",
+                content="Seek content",
+                slug=f"seek-post-{i}",
+                category=self.category,
+                status="published"
+            )
+
+        newest = Post.postobjects.order_by("-created_at", "-id").first()
+        url = reverse('post-list') + f"?after={_encode_cursor(newest)}&page_size=2"
+
+        response = self.client.get(url, HTTP_API_KEY=self.api_key)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        results = response.json()['results']
+        # 4 posts en total, el cursor apunta al mas nuevo: quedan 3, pagina de 2
+        self.assertEqual(len(results['results']), 2)
+        self.assertIsNotNone(results['next_cursor'])
+
+        # La siguiente pagina trae el ultimo post y no tiene cursor
+        url = reverse('post-list') + f"?after={results['next_cursor']}&page_size=2"
+        response = self.client.get(url, HTTP_API_KEY=self.api_key)
+        results = response.json()['results']
+        self.assertEqual(len(results['results']), 1)
+        self.assertIsNone(results['next_cursor'])
+
+        # Un cursor al final de la lista devuelve una pagina vacia, no un error
+        oldest = Post.postobjects.order_by("created_at", "id").first()
+        url = reverse('post-list') + f"?after={_encode_cursor(oldest)}&page_size=2"
+        response = self.client.get(url, HTTP_API_KEY=self.api_key)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.json()['results']
+        self.assertEqual(results['results'], [])
+        self.assertIsNone(results['next_cursor'])
+
+    def test_get_post_list_invalid_cursor(self):
+        """
+        Test para verificar que un cursor invalido devuelve un error de
+        solicitud y no un error 500.
+        """
+        import base64
+
+        # base64 bien formado pero con contenido basura
+        bad_cursor = base64.urlsafe_b64encode(b"junk|junk").decode()
+
+        for after in ["not-base64", bad_cursor]:
+            url = reverse('post-list') + f"?after={after}"
+            response = self.client.get(url, HTTP_API_KEY=self.api_key)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
 
 class PostDetailViewTest(TestCase):
     def setUp(self):
@@ -174,11 +277,11 @@ class PostDetailViewTest(TestCase):
     def tearDown(self):
         cache.clear() 
     
-    @patch('apps.blog.tasks.increment_post_views_task.delay')
-    def test_get_post_detail_success(self, mock_increment_views):
+    @patch('apps.blog.views.buffer_post_view')
+    def test_get_post_detail_success(self, mock_buffer_view):
         """
         Test para verificar que se obtienen los detalles de un post existente
-        y que la tarea de incremento de vistas se ejecuta correctamente.
+        y que la vista se registra en el buffer de redis.
         """
         # Ruta hacia la vista con query parameter 'slug'
         url = reverse('post-detail') + f"?slug={self.post.slug}"
@@ -218,10 +321,10 @@ class PostDetailViewTest(TestCase):
         # Verifica que el conteo de vistas sea inicial (0)
         self.assertEqual(post_data['view_count'], 0)
 
-        mock_increment_views.assert_called_once_with(self.post.slug, '127.0.0.1')  # IP predeterminada en tests
+        mock_buffer_view.assert_called_once_with(self.post.slug, '127.0.0.1')  # IP predeterminada en tests
 
-    @patch('apps.blog.tasks.increment_post_views_task.delay')
-    def test_get_post_detail_not_found(self, mock_increment_views):
+    @patch('apps.blog.views.buffer_post_view')
+    def test_get_post_detail_not_found(self, mock_buffer_view):
         """
         Test para verificar que se devuelve un error 404 si el post no existe.
         """
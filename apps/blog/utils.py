@@ -1,8 +1,131 @@
+import logging
+import queue
+import threading
+import time
+
+import redis
+from django.conf import settings
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+redis_client = redis.StrictRedis(host=settings.REDIS_HOST, port=6379, db=0)
+
+# Cache L1 en memoria del proceso, delante del cache de redis (L2) para las
+# claves mas calientes. El TTL corto acota la inconsistencia entre workers.
+_LOCAL_CACHE_MAXSIZE = 256
+_LOCAL_CACHE_TTL = 30
+
+_local_cache = {}
+_local_cache_lock = threading.Lock()
+
+
+def local_cache_get(key):
+    """
+    Devuelve el valor cacheado en el proceso o None si no existe o expiro.
+    """
+    with _local_cache_lock:
+        entry = _local_cache.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at < time.monotonic():
+            del _local_cache[key]
+            return None
+        return value
+
+
+def local_cache_set(key, value):
+    """
+    Guarda un valor en el cache L1, expulsando entradas expiradas (o la mas
+    vieja) cuando se alcanza el tamaño maximo.
+    """
+    with _local_cache_lock:
+        if len(_local_cache) >= _LOCAL_CACHE_MAXSIZE:
+            now = time.monotonic()
+            for expired_key in [k for k, (_, exp) in _local_cache.items() if exp < now]:
+                del _local_cache[expired_key]
+            if len(_local_cache) >= _LOCAL_CACHE_MAXSIZE:
+                oldest = min(_local_cache, key=lambda k: _local_cache[k][1])
+                del _local_cache[oldest]
+        _local_cache[key] = (value, time.monotonic() + _LOCAL_CACHE_TTL)
+
+
+def local_cache_clear():
+    with _local_cache_lock:
+        _local_cache.clear()
+
+
 def get_client_ip(request):
     x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
     if x_forwarded_for:
         ip = x_forwarded_for.split(',')[0]
     else:
         ip = request.META.get('REMOTE_ADDR')
-    
-    return ip
\ No newline at end of file
+
+    return ip
+
+
+# Los contadores de impresiones no necesitan confirmacion: las vistas los
+# encolan y un hilo daemon los agrupa en pipelines, sacando la latencia de
+# redis del camino critico de la peticion.
+_FLUSH_BATCH_SIZE = 1000
+_FLUSH_INTERVAL = 0.05
+
+_impression_queue = queue.Queue()
+_flush_thread = None
+_flush_thread_lock = threading.Lock()
+
+
+def _flush_impressions_forever():
+    while True:
+        batch = [_impression_queue.get()]
+        deadline = time.monotonic() + _FLUSH_INTERVAL
+        while len(batch) < _FLUSH_BATCH_SIZE:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(_impression_queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        try:
+            pipe = redis_client.pipeline(transaction=False)
+            for bucket, obj_id in batch:
+                pipe.hincrby(bucket, obj_id, 1)
+            pipe.execute()
+        except redis.RedisError as e:
+            logger.info(f"Error flushing {len(batch)} impression increments: {str(e)}")
+
+
+def _ensure_flush_thread():
+    global _flush_thread
+    if _flush_thread is not None and _flush_thread.is_alive():
+        return
+    with _flush_thread_lock:
+        if _flush_thread is None or not _flush_thread.is_alive():
+            _flush_thread = threading.Thread(
+                target=_flush_impressions_forever, name="impression-flusher", daemon=True
+            )
+            _flush_thread.start()
+
+
+def _bucket_key(prefix):
+    """
+    Un solo hash de contadores por dia (campo = id del objeto), en vez de
+    una clave de redis por objeto.
+    """
+    return f"{prefix}:{timezone.now():%Y%m%d}"
+
+
+def _bulk_increment(prefix, ids):
+    """
+    Encola los incrementos de contadores de redis; el hilo de flusheo los
+    envia en lote. O(1) y no bloqueante para la peticion.
+    """
+    if not ids:
+        return
+    _ensure_flush_thread()
+    bucket = _bucket_key(prefix)
+    for obj_id in ids:
+        _impression_queue.put((bucket, str(obj_id)))
@@ -1,26 +1,54 @@
 from rest_framework_api.views import StandardAPIView
 from rest_framework.exceptions import NotFound, APIException
 from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchVector
 from django.utils.decorators import method_decorator
 from django.views.decorators.cache import cache_page
 from django.core.cache import cache
 from django.db.models import Q, F, Prefetch
 from django.shortcuts import get_object_or_404
-import redis
 
 from core.permissions import HasValidAPIKey
-from .models import Post, Heading, PostAnalytics, Category, CategoryAnalytics
-from .serializers import PostListSerializer, PostSerializer, HeadingSerializer, CategoryListSerializer
-from .utils import get_client_ip
-from .tasks import increment_post_views_task
+from .models import (
+    Post,
+    Heading,
+    PostAnalytics,
+    Category,
+    CategoryAnalytics,
+    click_through_rate_expression,
+)
+from .serializers import (
+    PostSerializer,
+    HeadingSerializer,
+    serialize_post_list,
+    serialize_category_list,
+)
+from .utils import get_client_ip, _bulk_increment, local_cache_get, local_cache_set
+from .tasks import buffer_post_view
 
 from faker import Faker
+import base64
+import hashlib
 import random
+import time
 import uuid
+from datetime import datetime
 from django.utils.text import slugify
 
 
-redis_client = redis.StrictRedis(host=settings.REDIS_HOST, port=6379, db=0)
+def _encode_cursor(post):
+    """
+    Codifica el cursor de keyset (created_at, id) del ultimo post de la pagina.
+    """
+    raw = f"{post.created_at.isoformat()}|{post.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_cursor(cursor):
+    created_at, post_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+    # Validar el contenido aqui: base64 bien formado con basura adentro debe
+    # fallar con ValueError, no con ValidationError al evaluar el queryset
+    return datetime.fromisoformat(created_at), uuid.UUID(post_id)
 
 
 class PostListView(StandardAPIView):
@@ -34,53 +62,88 @@ class PostListView(StandardAPIView):
             ordering = request.query_params.get("ordering", None)
             categories = request.query_params.getlist("category", [])
             page = request.query_params.get("p", "1")
-
-            # Construir clave de cache para resultados paginados
-            cache_key = f"post_list:{search}:{sorting}:{ordering}:{categories}:{page}"
-            cached_posts = cache.get(cache_key)
-            if cached_posts:
-                # Serializar los datos del caché
-                serialized_posts = PostListSerializer(cached_posts, many=True).data
-                # Incrementar impresiones en Redis para los posts del caché
-                for post in cached_posts:
-                    redis_client.incr(f"post:impressions:{post.id}")  # Usar `post.id`
-                return self.paginate(request, serialized_posts)
+            after = request.query_params.get("after", None)
+
+            # Acotar page_size: default ante valores invalidos y tope superior
+            try:
+                page_size = int(request.query_params.get("page_size", 10))
+            except ValueError:
+                page_size = 10
+            page_size = max(1, min(page_size, 100))
+
+            # Construir clave de cache para resultados paginados: un hash corto
+            # y deterministico (las categorias ordenadas, para que el orden de
+            # los query params no fragmente el cache)
+            key_material = (search, sorting, ordering, tuple(sorted(categories)), page)
+            cache_key = f"post_list:{hashlib.blake2b(repr(key_material).encode(), digest_size=16).hexdigest()}"
+
+            # Las paginas por keyset no pasan por el cache de listados
+            if after is None:
+                # Revisar primero el cache L1 del proceso y luego redis (L2)
+                cached_posts = local_cache_get(cache_key)
+                if cached_posts is None:
+                    cached_posts = cache.get(cache_key)
+                    if cached_posts:
+                        local_cache_set(cache_key, cached_posts)
+                if cached_posts:
+                    # Reusar el payload ya serializado, sin volver a pasar por DRF
+                    _bulk_increment("post:impressions", cached_posts["ids"])
+                    return self.paginate(request, cached_posts["data"])
 
             # Consulta inicial optimizada
-            posts = Post.postobjects.all().select_related("category").prefetch_related(
-                Prefetch("post_analytics", to_attr="analytics_cache")
-            )
-
-            if not posts.exists():
-                raise NotFound(detail="No posts found.")
-            
-            # Filtrar por busqueda
+            posts = Post.postobjects.all().select_related(
+                "category", "thumbnail", "category__thumbnail"
+            ).prefetch_related(
+                Prefetch("post_analytics", to_attr="analytics_cache"),
+                Prefetch("category__category_analytics", to_attr="analytics_cache"),
+            ).defer("content", "keywords", "search_vector")
+
+            # Filtrar por busqueda (full-text sobre el indice GIN)
             if search != "":
-                posts = posts.filter(
-                    Q(title__icontains=search) |
-                    Q(description__icontains=search) |
-                    Q(content__icontains=search) |
-                    Q(keywords__icontains=search) 
-                )
+                posts = posts.filter(search_vector=SearchQuery(search, config="english"))
             
-            # Filtrar por categoria
+            # Filtrar por categoria (particionar una vez en UUIDs y slugs)
             if categories:
-                category_queries = Q()
+                category_ids, category_slugs = [], []
                 for category in categories:
                     # Check if category is a valid uuid
                     try:
-                        uuid.UUID(category)
-                        uuid_query = (
-                            Q(category__id=category)
-                        )
-                        category_queries |= uuid_query
+                        category_ids.append(uuid.UUID(category))
                     except ValueError:
-                        slug_query = (
-                            Q(category__slug=category)
-                        )
-                        category_queries |= slug_query
-                posts = posts.filter(category_queries)
-            
+                        category_slugs.append(category)
+                # Resolver primero los ids con una consulta chica sobre Category
+                # y filtrar los posts por PK, sin otro JOIN en la consulta grande
+                matching_category_ids = list(
+                    Category.objects.filter(
+                        Q(id__in=category_ids) | Q(slug__in=category_slugs)
+                    ).values_list("id", flat=True)
+                )
+                posts = posts.filter(category_id__in=matching_category_ids)
+
+            # Paginacion por keyset (seek) sobre el indice (created_at, id):
+            # O(log N) tambien en paginas profundas, sin OFFSET
+            if after is not None:
+                try:
+                    cursor_created_at, cursor_id = _decode_cursor(after)
+                except ValueError:
+                    return self.error("Invalid 'after' cursor")
+
+                posts = posts.filter(
+                    Q(created_at__lt=cursor_created_at) |
+                    Q(created_at=cursor_created_at, id__lt=cursor_id)
+                ).order_by("-created_at", "-id")[:page_size]
+
+                posts = list(posts)
+                if not posts:
+                    # Fin de la iteracion: pagina vacia, no un error
+                    return self.response({"results": [], "next_cursor": None})
+
+                serialized_posts = [serialize_post_list(post) for post in posts]
+                _bulk_increment("post:impressions", [str(post.id) for post in posts])
+
+                next_cursor = _encode_cursor(posts[-1]) if len(posts) == page_size else None
+                return self.response({"results": serialized_posts, "next_cursor": next_cursor})
+
             # Ordenamiento
             if sorting:
                 if sorting == 'newest':
@@ -93,18 +156,24 @@ class PostListView(StandardAPIView):
             if ordering:
                 if ordering == 'az':
                     posts = posts.order_by("title")
-                if ordering == 'za':
+                elif ordering == 'za':
                     posts = posts.order_by("-title")
 
-            # Guardar los objetos en el caché
-            cache.set(cache_key, posts, timeout=60 * 5)
+            # Materializar el resultado; evita el SELECT extra de .exists().
+            # Un filtro sin coincidencias pagina una lista vacia, como siempre
+            posts = list(posts)
 
             # Serializar los datos para la respuesta
-            serialized_posts = PostListSerializer(posts, many=True).data
+            serialized_posts = [serialize_post_list(post) for post in posts]
+            post_ids = [str(post.id) for post in posts]
+
+            # Guardar el payload serializado en el caché (no el queryset)
+            payload = {"ids": post_ids, "data": serialized_posts}
+            cache.set(cache_key, payload, timeout=60 * 5)
+            local_cache_set(cache_key, payload)
 
             # Incrementar impresiones en Redis
-            for post in posts:
-                redis_client.incr(f"post:impressions:{post.id}")  # Usar `post.id`
+            _bulk_increment("post:impressions", post_ids)
 
             return self.paginate(request, serialized_posts)
         except Exception as e:
@@ -123,21 +192,40 @@ class PostDetailView(StandardAPIView):
             raise NotFound(detail="A valid slug must be provided")
 
         try:
-            # Verificar si los datos están en caché
-            cached_post = cache.get(f"post_detail:{slug}")
-            if cached_post:
-                serialized_post = PostSerializer(cached_post).data
-                increment_post_views_task.delay(cached_post.slug, ip_address)
-                return self.response(serialized_post)
-
-            # Si no está en caché, obtener el post de la base de datos
-            post = Post.postobjects.get(slug=slug)
-            serialized_post = PostSerializer(post).data
+            # v2: el valor cacheado paso de instancia pickleada a payload serializado
+            cache_key = f"post_detail:v2:{slug}"
 
-            # Guardar en el caché
-            cache.set(f"post_detail:{slug}", post, timeout=60 * 5)
+            # Verificar si los datos están en caché (payload ya serializado)
+            serialized_post = cache.get(cache_key)
+            if serialized_post:
+                buffer_post_view(slug, ip_address)
+                return self.response(serialized_post)
 
-            increment_post_views_task.delay(post.slug, ip_address)
+            # Lock corto para que un solo worker regenere la entrada y el resto
+            # espere (evita la estampida SQL cuando expira un post popular)
+            lock_key = f"{cache_key}:lock"
+            if cache.add(lock_key, 1, timeout=5):
+                try:
+                    post = Post.postobjects.get(slug=slug)
+                    serialized_post = PostSerializer(post).data
+
+                    # Guardar el payload serializado en el caché
+                    cache.set(cache_key, serialized_post, timeout=60 * 5)
+                finally:
+                    cache.delete(lock_key)
+            else:
+                # Otro worker esta regenerando: esperar y reintentar el cache
+                for _ in range(10):
+                    time.sleep(0.05)
+                    serialized_post = cache.get(cache_key)
+                    if serialized_post:
+                        break
+                else:
+                    # Fallback: consultar la base de datos de todos modos
+                    post = Post.postobjects.get(slug=slug)
+                    serialized_post = PostSerializer(post).data
+
+            buffer_post_view(slug, ip_address)
 
         except Post.DoesNotExist:
             raise NotFound(detail="The requested post does not exist")
@@ -167,19 +255,28 @@ class IncrementPostClickView(StandardAPIView):
         data = request.data
 
         try:
-            post = Post.postobjects.get(slug=data['slug'])
+            # Solo se necesita el id para el filtro de analytics
+            post = Post.postobjects.only("id").get(slug=data['slug'])
         except Post.DoesNotExist:
             raise NotFound(detail="The requested post does not exist")
         
         try:
-            post_analytics, created = PostAnalytics.objects.get_or_create(post=post)
-            post_analytics.increment_click()
+            # Un solo UPDATE atomico (clicks y CTR) en vez de leer-modificar-guardar
+            updated = PostAnalytics.objects.filter(post=post).update(
+                clicks=F("clicks") + 1,
+                click_through_rate=click_through_rate_expression(clicks=F("clicks") + 1),
+            )
+            if updated:
+                clicks = PostAnalytics.objects.values_list("clicks", flat=True).get(post=post)
+            else:
+                post_analytics, _ = PostAnalytics.objects.get_or_create(post=post, defaults={"clicks": 1})
+                clicks = post_analytics.clicks
         except Exception as e:
             raise APIException(detail=f"An error ocurred while updating post analytics: {str(e)}")
 
         return self.response({
             "message": "Click incremented successfully",
-            "clicks": post_analytics.clicks
+            "clicks": clicks
         })
 
 
@@ -197,15 +294,19 @@ class CategoryListView(StandardAPIView):
             page = request.query_params.get("p", "1")
 
             # Construir clave de cache para resultados paginados
-            cache_key = f"category_list:{page}:{ordering}:{sorting}:{search}:{parent_slug}"
-            cached_categories = cache.get(cache_key)
+            # v2: el valor cacheado paso de queryset pickleado a payload serializado
+            cache_key = f"category_list:v2:{page}:{ordering}:{sorting}:{search}:{parent_slug}"
+
+            # Revisar primero el cache L1 del proceso y luego redis (L2)
+            cached_categories = local_cache_get(cache_key)
+            if cached_categories is None:
+                cached_categories = cache.get(cache_key)
+                if cached_categories:
+                    local_cache_set(cache_key, cached_categories)
             if cached_categories:
-                # Serializar los datos del caché
-                serialized_categories = CategoryListSerializer(cached_categories, many=True).data
-                # Incrementar impresiones en Redis para los posts del caché
-                for category in cached_categories:
-                    redis_client.incr(f"category:impressions:{category.id}")  # Usar `post.id`
-                return self.paginate(request, serialized_categories)
+                # Reusar el payload ya serializado, sin volver a pasar por DRF
+                _bulk_increment("category:impressions", cached_categories["ids"])
+                return self.paginate(request, cached_categories["data"])
 
             # Consulta inicial optimizada
             if parent_slug:
@@ -218,9 +319,6 @@ class CategoryListView(StandardAPIView):
                     Prefetch("category_analytics", to_attr="analytics_cache")
                 )
 
-            if not categories.exists():
-                raise NotFound(detail="No categories found.")
-            
             # Filtrar por busqueda
             if search != "":
                 categories = categories.filter(
@@ -241,19 +339,25 @@ class CategoryListView(StandardAPIView):
 
             if ordering:
                 if ordering == 'az':
-                    posts = posts.order_by("name")
-                if ordering == 'za':
-                    posts = posts.order_by("-name")
+                    categories = categories.order_by("name")
+                elif ordering == 'za':
+                    categories = categories.order_by("-name")
 
-            # Guardar los objetos en el caché
-            cache.set(cache_key, categories, timeout=60 * 5)
+            # Materializar el resultado; evita el SELECT extra de .exists().
+            # Un filtro sin coincidencias pagina una lista vacia, como siempre
+            categories = list(categories)
 
             # Serializacion
-            serialized_categories = CategoryListSerializer(categories, many=True).data
+            serialized_categories = [serialize_category_list(category) for category in categories]
+            category_ids = [str(category.id) for category in categories]
+
+            # Guardar el payload serializado en el caché (no el queryset)
+            payload = {"ids": category_ids, "data": serialized_categories}
+            cache.set(cache_key, payload, timeout=60 * 5)
+            local_cache_set(cache_key, payload)
 
             # Incrementar impresiones en Redis
-            for category in categories:
-                redis_client.incr(f"category:impressions:{category.id}")
+            _bulk_increment("category:impressions", category_ids)
 
             return self.paginate(request, serialized_categories)
         except Exception as e:
@@ -274,15 +378,13 @@ class CategoryDetailView(StandardAPIView):
                 return self.error("Missing slug parameter")
             
             # Construir cache
-            cache_key = f"category_posts:{slug}:{page}"
+            # v2: el valor cacheado paso de queryset pickleado a payload serializado
+            cache_key = f"category_posts:v2:{slug}:{page}"
             cached_posts = cache.get(cache_key)
             if cached_posts:
-                # Serializar los datos del caché
-                serialized_posts = PostListSerializer(cached_posts, many=True).data
-                # Incrementar impresiones en Redis para los posts del caché
-                for post in cached_posts:
-                    redis_client.incr(f"post:impressions:{post.id}")  # Usar `post.id`
-                return self.paginate(request, serialized_posts)
+                # Reusar el payload ya serializado, sin volver a pasar por DRF
+                _bulk_increment("post:impressions", cached_posts["ids"])
+                return self.paginate(request, cached_posts["data"])
 
             # Obtener la categoria por slug
             category = get_object_or_404(Category, slug=slug)
@@ -295,15 +397,15 @@ class CategoryDetailView(StandardAPIView):
             if not posts.exists():
                 raise NotFound(detail=f"No posts found for category '{category.name}'")
             
-            # Guardar los objetos en el caché
-            cache.set(cache_key, posts, timeout=60 * 5)
-
             # Serializar los posts
-            serialized_posts = PostListSerializer(posts, many=True).data
+            serialized_posts = [serialize_post_list(post) for post in posts]
+            post_ids = [str(post.id) for post in posts]
+
+            # Guardar el payload serializado en el caché (no el queryset)
+            cache.set(cache_key, {"ids": post_ids, "data": serialized_posts}, timeout=60 * 5)
 
             # Incrementar impresiones en Redis
-            for post in posts:
-                redis_client.incr(f"post:impressions:{post.id}")
+            _bulk_increment("post:impressions", post_ids)
 
             return self.paginate(request, serialized_posts)
         except Exception as e:
@@ -325,14 +427,22 @@ class IncrementCategoryClickView(StandardAPIView):
             raise NotFound(detail="The requested category does not exist")
         
         try:
-            category_analytics, created = CategoryAnalytics.objects.get_or_create(category=category)
-            category_analytics.increment_click()
+            # Un solo UPDATE atomico (clicks y CTR) en vez de leer-modificar-guardar
+            updated = CategoryAnalytics.objects.filter(category=category).update(
+                clicks=F("clicks") + 1,
+                click_through_rate=click_through_rate_expression(clicks=F("clicks") + 1),
+            )
+            if updated:
+                clicks = CategoryAnalytics.objects.values_list("clicks", flat=True).get(category=category)
+            else:
+                category_analytics, _ = CategoryAnalytics.objects.get_or_create(category=category, defaults={"clicks": 1})
+                clicks = category_analytics.clicks
         except Exception as e:
             raise APIException(detail=f"An error ocurred while updating category analytics: {str(e)}")
 
         return self.response({
             "message": "Click incremented successfully",
-            "clicks": category_analytics.clicks
+            "clicks": clicks
         })
 
 
@@ -351,9 +461,10 @@ class GenerateFakePostsView(StandardAPIView):
         posts_to_generate = 100  # Número de posts ficticios a generar
         status_options = ["draft", "published"]
 
+        posts = []
         for _ in range(posts_to_generate):
             title = fake.sentence(nb_words=6)  # Generar título aleatorio
-            post = Post(
+            posts.append(Post(
                 id=uuid.uuid4(),
                 title=title,
                 description=fake.sentence(nb_words=12),
@@ -362,8 +473,19 @@ class GenerateFakePostsView(StandardAPIView):
                 slug=slugify(title),  # Generar slug a partir del título
                 category=random.choice(categories),  # Asignar una categoría aleatoria
                 status=random.choice(status_options),
-            )
-            post.save()
+            ))
+
+        # Un solo INSERT multi-VALUES en vez de 100 saves
+        Post.objects.bulk_create(posts, batch_size=500)
+
+        # bulk_create no dispara las señales post_save: crear las analiticas
+        # y el vector de busqueda en lote tambien
+        PostAnalytics.objects.bulk_create(
+            [PostAnalytics(post=post) for post in posts], batch_size=500
+        )
+        Post.objects.filter(id__in=[post.id for post in posts]).update(
+            search_vector=SearchVector("title", "description", "content", "keywords", config="english")
+        )
 
         return self.response(f"{posts_to_generate} posts generados exitosamente.")
     
@@ -382,19 +504,29 @@ class GenerateFakeAnalyticsView(StandardAPIView):
         analytics_to_generate = len(posts)  # Una analítica por post
 
         # Generar analíticas para cada post
+        analytics_list = []
         for post in posts:
             views = random.randint(50, 1000)  # Número aleatorio de vistas
             impressions = views + random.randint(100, 2000)  # Impresiones >= vistas
             clicks = random.randint(0, views)  # Los clics son <= vistas
             avg_time_on_page = round(random.uniform(10, 300), 2)  # Tiempo promedio en segundos
-            
-            # Crear o actualizar analíticas para el post
-            analytics, created = PostAnalytics.objects.get_or_create(post=post)
-            analytics.views = views
-            analytics.impressions = impressions
-            analytics.clicks = clicks
-            analytics.avg_time_on_page = avg_time_on_page
-            analytics._update_click_through_rate()  # Recalcular el CTR
-            analytics.save()
+
+            analytics_list.append(PostAnalytics(
+                post=post,
+                views=views,
+                impressions=impressions,
+                clicks=clicks,
+                click_through_rate=(clicks / impressions) * 100 if impressions > 0 else 0,
+                avg_time_on_page=avg_time_on_page,
+            ))
+
+        # Un solo INSERT ... ON CONFLICT DO UPDATE en vez de 2-3 queries por post
+        PostAnalytics.objects.bulk_create(
+            analytics_list,
+            batch_size=500,
+            update_conflicts=True,
+            unique_fields=["post"],
+            update_fields=["views", "impressions", "clicks", "click_through_rate", "avg_time_on_page"],
+        )
 
         return self.response({"message": f"Analíticas generadas para {analytics_to_generate} posts."})
\ No newline at end of file
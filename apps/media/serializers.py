@@ -1,4 +1,6 @@
 import datetime
+import threading
+import time
 
 from rest_framework import serializers
 from botocore.signers import CloudFrontSigner
@@ -8,6 +10,64 @@ from django.utils import timezone
 from utils.s3_utils import rsa_signer
 from .models import Media
 
+# Las URLs firmadas valen 60s; memoizarlas por la mitad de su vida evita una
+# firma RSA por miniatura en cada serializacion de listados
+_SIGNED_URL_TTL = 30
+_SIGNED_URL_CACHE_MAXSIZE = 1024
+
+_signed_url_cache = {}
+_signed_url_lock = threading.Lock()
+
+
+def get_media_signed_url(obj):
+    """
+    Genera (y memoiza) la URL firmada de CloudFront para un objeto Media.
+    """
+    if not obj.key:
+        return None
+
+    with _signed_url_lock:
+        entry = _signed_url_cache.get(obj.key)
+        if entry is not None and entry[1] > time.monotonic():
+            return entry[0]
+
+    key_id = str(settings.AWS_CLOUDFRONT_KEY_ID)
+    obj_url = f"https://{settings.AWS_CLOUDFRONT_DOMAIN}/{obj.key}"
+
+    cloudfront_signer = CloudFrontSigner(key_id, rsa_signer)
+    expire_date = timezone.now() + datetime.timedelta(seconds=60)
+    signed_url = cloudfront_signer.generate_presigned_url(obj_url, date_less_than=expire_date)
+
+    with _signed_url_lock:
+        if len(_signed_url_cache) >= _SIGNED_URL_CACHE_MAXSIZE:
+            now = time.monotonic()
+            for expired_key in [k for k, (_, exp) in _signed_url_cache.items() if exp < now]:
+                del _signed_url_cache[expired_key]
+            if len(_signed_url_cache) >= _SIGNED_URL_CACHE_MAXSIZE:
+                _signed_url_cache.clear()
+        _signed_url_cache[obj.key] = (signed_url, time.monotonic() + _SIGNED_URL_TTL)
+
+    return signed_url
+
+
+def serialize_media(media):
+    """
+    Version en dict plano de MediaSerializer para los endpoints calientes,
+    sin el costo de construir y bindear campos de DRF por instancia.
+    """
+    if media is None:
+        return None
+    return {
+        "id": str(media.id),
+        "order": media.order,
+        "name": media.name,
+        "size": media.size,
+        "type": media.type,
+        "key": media.key,
+        "media_type": media.media_type,
+        "url": get_media_signed_url(media),
+    }
+
 
 class MediaSerializer(serializers.ModelSerializer):
     url = serializers.SerializerMethodField()
@@ -17,13 +77,4 @@ class MediaSerializer(serializers.ModelSerializer):
         fields = "__all__"
 
     def get_url(self, obj):
-        if not obj.key:
-            return None
-        
-        key_id = str(settings.AWS_CLOUDFRONT_KEY_ID)
-        obj_url = f"https://{settings.AWS_CLOUDFRONT_DOMAIN}/{obj.key}"
-
-        cloudfront_signer = CloudFrontSigner(key_id, rsa_signer)
-        expire_date = timezone.now() + datetime.timedelta(seconds=60)
-        signed_url = cloudfront_signer.generate_presigned_url(obj_url, date_less_than=expire_date)
-        return signed_url
\ No newline at end of file
+        return get_media_signed_url(obj)
\ No newline at end of file
@@ -0,0 +1,15 @@
+import orjson
+
+from rest_framework.renderers import JSONRenderer
+
+
+class OrjsonRenderer(JSONRenderer):
+    """
+    JSONRenderer respaldado por orjson: encoder nativo que emite bytes
+    directamente, varias veces mas rapido que json.dumps en payloads grandes.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_UTC_Z)
@@ -29,6 +29,7 @@ DJANGO_APPS = [
     'django.contrib.contenttypes',
     'django.contrib.sessions',
     'django.contrib.messages',
+    'django.contrib.postgres',
     'django.contrib.staticfiles',
 ]
 
@@ -147,6 +148,9 @@ REST_FRAMEWORK = {
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.AllowAny"
     ],
+    "DEFAULT_RENDERER_CLASSES": [
+        "core.renderers.OrjsonRenderer"
+    ],
 }
 
 CHANNEL_LAYERS = {